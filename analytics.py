@@ -0,0 +1,148 @@
+# analytics.py
+
+import os
+import json
+import hashlib
+import zipfile
+from collections import OrderedDict
+import numpy as np
+from columnar_export import actions_to_columns
+
+# Settings for the statistics engine
+grid_width = 64  # Number of heatmap cells across the screen; the height follows the screen aspect ratio
+rate_bin = 1.0  # Seconds per bin of the event-rate timeline
+cache_dir = ".mousepad_cache"  # Where computed statistics are stored on disk
+memory_cache_size = 32  # Number of recordings whose statistics are kept in memory
+
+# Statistics computed in this session, keyed by content hash, least recently used first
+_memory_cache = OrderedDict()
+
+def content_hash(actions, screen_size=None):
+    """Hash a recording together with the settings that affect its statistics."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(actions, sort_keys=True).encode("utf-8"))
+    digest.update(json.dumps([screen_size, grid_width, rate_bin]).encode("utf-8"))
+    return digest.hexdigest()
+
+def compute_stats(actions, screen_size=None):
+    """Compute heatmaps, dwell times, an event-rate timeline and key frequencies.
+
+    screen_size is (width, height). When it is not given, the largest recorded
+    position is used. Returns a dict of NumPy arrays.
+    """
+    columns = actions_to_columns(actions)
+    types, x, y, timestamps = columns["type"], columns["x"], columns["y"], columns["timestamp"]
+    has_position = ~(np.isnan(x) | np.isnan(y))
+
+    if screen_size is None:
+        width = np.nanmax(x) + 1 if has_position.any() else 1
+        height = np.nanmax(y) + 1 if has_position.any() else 1
+    else:
+        width, height = screen_size
+    grid_height = max(1, int(round(grid_width * height / width)))
+    edges = [np.linspace(0, height, grid_height + 1), np.linspace(0, width, grid_width + 1)]
+
+    def heatmap(mask, weights=None):
+        counts, _, _ = np.histogram2d(y[mask], x[mask], bins=edges, weights=weights)
+        return counts
+
+    clicks = types == "button_press"
+    moves = types == "move"
+    # The cursor stays where an event left it until the next event
+    durations = np.diff(timestamps, append=timestamps[-1] if len(timestamps) else 0)
+    durations = np.clip(np.nan_to_num(durations), 0, None)
+
+    if len(timestamps):
+        elapsed = timestamps - timestamps[0]
+        rate_edges = np.arange(0, elapsed.max() + rate_bin, rate_bin)
+        if len(rate_edges) < 2:
+            rate_edges = np.array([0, rate_bin])
+        event_rate, _ = np.histogram(elapsed, bins=rate_edges)
+    else:
+        event_rate = np.zeros(0, dtype=np.int64)
+
+    # Batched text counts as one key press per character, named like recorded keys
+    typed = ["space" if char == " " else char
+             for text in columns["text"][types == "type_text"] for char in text]
+    pressed = np.concatenate([columns["key"][types == "key_press"], np.array(typed, dtype=str)])
+    keys, key_counts = np.unique(pressed, return_counts=True)
+    order = np.argsort(-key_counts, kind="stable")
+
+    return {
+        "screen_size": np.array([width, height], dtype=np.float64),
+        "click_heatmap": heatmap(clicks),
+        "move_heatmap": heatmap(moves),
+        "dwell": heatmap(has_position, durations[has_position]),
+        "event_rate": event_rate,
+        "keys": keys[order],
+        "key_counts": key_counts[order],
+        "summary": np.array([len(actions), clicks.sum(), moves.sum(), len(pressed),
+                             timestamps[-1] - timestamps[0] if len(timestamps) else 0.0])
+    }
+
+def get_stats(actions, screen_size=None):
+    """Get the statistics for a recording, using the memory and disk caches when possible."""
+    key = content_hash(actions, screen_size)
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return _memory_cache[key]
+    path = os.path.join(cache_dir, f"{key}.npz")
+    try:
+        with np.load(path) as cached:
+            stats = {name: cached[name] for name in cached.files}
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        # Missing or corrupt cache file, so compute again and overwrite it
+        stats = compute_stats(actions, screen_size)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(path, **stats)
+        except OSError as e:
+            print(f"Could not cache statistics: {e}")
+    _memory_cache[key] = stats
+    while len(_memory_cache) > memory_cache_size:
+        _memory_cache.popitem(last=False)
+    return stats
+
+def top_dwell_regions(stats, count=5):
+    """Return the screen regions where the cursor spent the most time.
+
+    Each entry is ((x1, y1, x2, y2), seconds).
+    """
+    dwell = stats["dwell"]
+    width, height = stats["screen_size"]
+    cell_width = width / dwell.shape[1]
+    cell_height = height / dwell.shape[0]
+    flat = np.argsort(dwell, axis=None)[::-1][:count]
+    regions = []
+    for row, col in zip(*np.unravel_index(flat, dwell.shape)):
+        if dwell[row, col] <= 0:
+            break
+        area = (int(col * cell_width), int(row * cell_height),
+                int((col + 1) * cell_width), int((row + 1) * cell_height))
+        regions.append((area, float(dwell[row, col])))
+    return regions
+
+def render_preview(stats, max_width=440):
+    """Render the move and click heatmaps as an RGB image (height, width, 3) of uint8.
+
+    Movement density is drawn in green and clicks in red, on a log scale so that
+    a few busy cells do not hide everything else.
+    """
+    def normalize(values):
+        values = np.log1p(values)
+        peak = values.max()
+        return values / peak if peak > 0 else values
+
+    moves = normalize(stats["move_heatmap"])
+    clicks = normalize(stats["click_heatmap"])
+    image = np.zeros(moves.shape + (3,), dtype=np.uint8)
+    image[..., 0] = (clicks * 255).astype(np.uint8)
+    image[..., 1] = (moves * 200).astype(np.uint8)
+    image[..., 2] = 40
+    scale = max(1, max_width // moves.shape[1])
+    return np.repeat(np.repeat(image, scale, axis=0), scale, axis=1)
+
+def to_ppm(image):
+    """Encode an RGB uint8 image as binary PPM, which Tk can display directly."""
+    height, width, _ = image.shape
+    return f"P6 {width} {height} 255 ".encode("ascii") + np.ascontiguousarray(image).tobytes()
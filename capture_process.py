@@ -0,0 +1,191 @@
+# capture_process.py
+
+import struct
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+
+# Ring header: events written, events read, events dropped because the ring was full.
+# The child process only writes the first and last counters, the main process only the second.
+HEADER = struct.Struct("<QQQ")
+# Event record: type code, timestamp, x, y, dx, dy, key or button name
+RECORD = struct.Struct("<Bdiiii32s")
+
+EVENT_TYPES = ["move", "button_press", "button_release", "scroll", "key_press", "key_release", "sync"]
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+default_capacity = 65536  # Number of events the ring can hold before dropping
+
+class EventRing:
+    """Fixed-size ring of event records in a shared memory buffer."""
+
+    def __init__(self, buf, capacity):
+        self.buf = buf
+        self.capacity = capacity
+
+    def counters(self):
+        """Return the (written, read, dropped) counters."""
+        return HEADER.unpack_from(self.buf, 0)
+
+    def push(self, event_type, timestamp, x=0, y=0, dx=0, dy=0, name=""):
+        """Write one event, or count it as dropped if the ring is full."""
+        written, read, dropped = self.counters()
+        if written - read >= self.capacity:
+            struct.pack_into("<Q", self.buf, 16, dropped + 1)
+            return False
+        offset = HEADER.size + (written % self.capacity) * RECORD.size
+        RECORD.pack_into(self.buf, offset, EVENT_CODES[event_type], timestamp,
+                         int(x), int(y), int(dx), int(dy), name.encode("utf-8")[:32])
+        # Publish the record only after it has been fully written
+        struct.pack_into("<Q", self.buf, 0, written + 1)
+        return True
+
+    def drain(self, max_events=None):
+        """Read all available events (or at most max_events) as action dicts."""
+        written, read, _ = self.counters()
+        if max_events is not None:
+            written = min(written, read + max_events)
+        events = []
+        for index in range(read, written):
+            offset = HEADER.size + (index % self.capacity) * RECORD.size
+            code, timestamp, x, y, dx, dy, name = RECORD.unpack_from(self.buf, offset)
+            events.append({
+                "type": EVENT_TYPES[code],
+                "timestamp": timestamp,
+                "x": x,
+                "y": y,
+                "dx": dx,
+                "dy": dy,
+                "name": name.rstrip(b"\0").decode("utf-8", "replace")
+            })
+        struct.pack_into("<Q", self.buf, 8, written)
+        return events
+
+def _capture_main(shm_name, capacity, ready_event, stop_event, area, record_moves, move_interval,
+                  sync_key_name, screen_size):
+    """Run the mouse and keyboard listeners in the child process."""
+    import time
+    from pynput import mouse, keyboard
+    from input_helpers import get_key_name, within_area
+    import screen_sync
+
+    mouse_controller = mouse.Controller()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = EventRing(shm.buf, capacity)
+    lock = threading.Lock()  # Mouse and keyboard listeners run on separate threads
+    last_move_time = [0]
+
+    def push(*args, **kwargs):
+        with lock:
+            ring.push(*args, **kwargs)
+
+    def on_move(x, y):
+        if record_moves and within_area(area, x, y):
+            current_time = time.time()
+            if current_time - last_move_time[0] >= move_interval:
+                push("move", current_time, x, y)
+                last_move_time[0] = current_time
+
+    def on_click(x, y, button, pressed):
+        if within_area(area, x, y):
+            push("button_press" if pressed else "button_release", time.time(), x, y, name=button.name)
+
+    def on_scroll(x, y, dx, dy):
+        if within_area(area, x, y):
+            push("scroll", time.time(), x, y, dx, dy)
+
+    def on_press(key):
+        key_name = get_key_name(key)
+        if key_name == sync_key_name:
+            # Grab the reference now, while the screen still shows what the user saw
+            timestamp = time.time()
+            x, y = mouse_controller.position
+            data = screen_sync.capture_sync_point(x, y, screen_size)
+            push("sync", timestamp, x, y, name=data["hash"])
+        else:
+            push("key_press", time.time(), name=key_name)
+
+    def on_release(key):
+        key_name = get_key_name(key)
+        if key_name != sync_key_name:
+            push("key_release", time.time(), name=key_name)
+
+    mouse_listener = mouse.Listener(on_move=on_move, on_click=on_click, on_scroll=on_scroll)
+    keyboard_listener = keyboard.Listener(on_press=on_press, on_release=on_release)
+    mouse_listener.start()
+    keyboard_listener.start()
+    mouse_listener.wait()
+    keyboard_listener.wait()
+    ready_event.set()
+    try:
+        stop_event.wait()
+    finally:
+        mouse_listener.stop()
+        keyboard_listener.stop()
+        del ring
+        shm.close()
+
+class CaptureProcess:
+    """Capture input in a child process and hand events over through shared memory."""
+
+    def __init__(self, area=None, record_moves=True, move_interval=0.1, sync_key_name="f8",
+                 screen_size=(1920, 1080), capacity=default_capacity):
+        self.area = area
+        self.record_moves = record_moves
+        self.move_interval = move_interval
+        self.sync_key_name = sync_key_name
+        self.screen_size = tuple(screen_size)
+        self.capacity = capacity
+        self.shm = None
+        self.ring = None
+        self.process = None
+        self.stop_event = None
+
+    def start(self, timeout=5.0):
+        """Start the child process and wait until its listeners are running."""
+        self.shm = shared_memory.SharedMemory(create=True, size=HEADER.size + self.capacity * RECORD.size)
+        HEADER.pack_into(self.shm.buf, 0, 0, 0, 0)
+        self.ring = EventRing(self.shm.buf, self.capacity)
+        context = multiprocessing.get_context("spawn")
+        ready_event = context.Event()
+        self.stop_event = context.Event()
+        self.process = context.Process(
+            target=_capture_main,
+            args=(self.shm.name, self.capacity, ready_event, self.stop_event, self.area,
+                  self.record_moves, self.move_interval, self.sync_key_name, self.screen_size),
+            daemon=True)
+        self.process.start()
+        if not ready_event.wait(timeout):
+            self.stop()
+            raise RuntimeError("Capture process did not start in time.")
+
+    def drain(self, max_events=None):
+        """Read the events captured since the last drain."""
+        if self.ring is None:
+            return []
+        return self.ring.drain(max_events)
+
+    @property
+    def dropped(self):
+        """Number of events dropped because the ring was full."""
+        if self.ring is None:
+            return 0
+        return self.ring.counters()[2]
+
+    def stop(self):
+        """Stop the child process. Events still in the ring can be drained afterwards."""
+        if self.process is not None:
+            self.stop_event.set()
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+
+    def close(self):
+        """Release the shared memory."""
+        self.stop()
+        if self.shm is not None:
+            self.ring = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
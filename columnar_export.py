@@ -0,0 +1,133 @@
+# columnar_export.py
+#
+# Export recordings as columnar tables for analysis. Parquet and Arrow files
+# need pyarrow; without it recordings can still be exported to NumPy .npz files.
+# A whole directory can be exported into one dataset from the project root:
+#     python -m columnar_export actions/ dataset.parquet
+import os
+import sys
+import json
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from recording_files import find_recordings, validate_actions
+
+# Typed columns for the known action fields. Missing numbers are NaN, missing strings are empty.
+NUMERIC_COLUMNS = ["timestamp", "end_timestamp", "delay", "x", "y", "dx", "dy", "interval", "threshold", "timeout"]
+STRING_COLUMNS = ["type", "button", "key", "text", "hash"]
+FORMATS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".npz": "npz"}
+
+def actions_to_columns(actions):
+    """Convert a list of actions into a dict of NumPy column arrays."""
+    count = len(actions)
+    columns = {"event_index": np.arange(count, dtype=np.int64)}
+    for name in NUMERIC_COLUMNS:
+        columns[name] = np.fromiter(
+            (action.get(name, np.nan) for action in actions), dtype=np.float64, count=count)
+    for name in STRING_COLUMNS:
+        columns[name] = np.array([str(action.get(name, "")) for action in actions], dtype=str)
+    # Anything else (such as a sync region) is kept as JSON so nothing is lost
+    known = set(NUMERIC_COLUMNS) | set(STRING_COLUMNS)
+    columns["extra"] = np.array(
+        [json.dumps({k: v for k, v in action.items() if k not in known}) if set(action) - known else ""
+         for action in actions], dtype=str)
+    return columns
+
+def columns_to_table(columns):
+    """Wrap NumPy columns in an Arrow table. Numeric columns are not copied."""
+    arrays = {}
+    for name, values in columns.items():
+        if values.dtype.kind == "U":
+            arrays[name] = pa.array(values.tolist(), type=pa.string())
+        else:
+            arrays[name] = pa.array(values)
+    return pa.table(arrays)
+
+def detect_format(filename, format=None):
+    """Pick the export format from the argument or the file extension."""
+    if format is None:
+        format = FORMATS.get(os.path.splitext(filename)[1].lower())
+    if format is None:
+        format = "parquet" if pa is not None else "npz"
+    if format not in ("parquet", "arrow", "npz"):
+        raise ValueError(f"Unknown export format: {format}")
+    if format != "npz" and pa is None:
+        raise ImportError(f"Exporting to {format} requires pyarrow. Use a .npz file instead.")
+    return format
+
+def export_actions(actions, filename, format=None):
+    """Export one recording as a columnar table."""
+    format = detect_format(filename, format)
+    columns = actions_to_columns(actions)
+    if format == "npz":
+        np.savez(filename, **columns)
+    elif format == "parquet":
+        pq.write_table(columns_to_table(columns), filename)
+    else:
+        with pa.OSFile(filename, "wb") as sink:
+            table = columns_to_table(columns)
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+def export_directory(directory, filename, format=None, update_log=None):
+    """Export every recording in a directory into one dataset with a source column.
+
+    Parquet and Arrow files are written one recording at a time, so memory use
+    does not grow with the size of the library. Returns (files, events, skipped).
+    """
+    format = detect_format(filename, format)
+    files = events = skipped = 0
+    writer = None
+    sink = None
+    chunks = {}
+    try:
+        for path in find_recordings(directory):
+            try:
+                with open(path, "r") as f:
+                    actions = json.load(f)
+            except (OSError, ValueError):
+                actions = None
+            if actions is None or validate_actions(actions):
+                skipped += 1
+                continue
+            columns = actions_to_columns(actions)
+            columns["source"] = np.full(len(actions), os.path.relpath(path, directory))
+            files += 1
+            events += len(actions)
+            if format == "npz":
+                for name, values in columns.items():
+                    chunks.setdefault(name, []).append(values)
+                continue
+            table = columns_to_table(columns)
+            if writer is None:
+                if format == "parquet":
+                    writer = pq.ParquetWriter(filename, table.schema)
+                else:
+                    sink = pa.OSFile(filename, "wb")
+                    writer = pa.ipc.new_file(sink, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+    if format == "npz":
+        np.savez(filename, **{name: np.concatenate(values) for name, values in chunks.items()})
+    message = f"Exported {events} actions from {files} recordings to {filename} ({skipped} skipped)"
+    if update_log:
+        update_log(message)
+    else:
+        print(message)
+    return files, events, skipped
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m columnar_export <directory> <output.parquet|.arrow|.npz>")
+        sys.exit(2)
+    export_directory(sys.argv[1], sys.argv[2])
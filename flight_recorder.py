@@ -0,0 +1,142 @@
+# flight_recorder.py
+
+import time
+import json
+import threading
+from collections import deque
+from pynput import mouse, keyboard
+import recording
+from input_helpers import get_key_name
+
+# Global variables to track the flight recorder state
+is_running = False
+capacity = 200000  # Maximum number of events kept in memory
+retention = 600  # Events older than this many seconds are discarded
+events = deque(maxlen=capacity)
+events_lock = threading.Lock()
+mouse_listener = None
+keyboard_listener = None
+last_mouse_move_time = 0  # For throttling mouse move events
+last_position = (0, 0)  # Last known mouse position
+
+def add_event(action_type, **kwargs):
+    """Add an event to the ring, dropping events older than the retention period."""
+    now = time.time()
+    with events_lock:
+        events.append({"type": action_type, "timestamp": now, **kwargs})
+        while events and now - events[0]["timestamp"] > retention:
+            events.popleft()
+
+def set_capacity(value):
+    """Set the maximum number of events kept in memory."""
+    global capacity, events
+    capacity = value
+    with events_lock:
+        events = deque(events, maxlen=capacity)
+
+def set_retention(seconds):
+    """Set how many seconds of events are kept."""
+    global retention
+    retention = seconds
+
+def start_flight_recorder(update_log=None):
+    """Start capturing input continuously into the ring."""
+    global is_running, mouse_listener, keyboard_listener
+    if is_running:
+        return
+    is_running = True
+    mouse_listener = mouse.Listener(on_move=on_move, on_click=on_click, on_scroll=on_scroll)
+    mouse_listener.start()
+    keyboard_listener = keyboard.Listener(on_press=on_press, on_release=on_release)
+    keyboard_listener.start()
+    if update_log:
+        update_log(f"Flight recorder started, keeping the last {retention // 60} minutes of input.")
+    else:
+        print(f"Flight recorder started, keeping the last {retention // 60} minutes of input.")
+
+def stop_flight_recorder(update_log=None):
+    """Stop the flight recorder. Events already captured are kept."""
+    global is_running, mouse_listener, keyboard_listener
+    is_running = False
+    if mouse_listener is not None:
+        mouse_listener.stop()
+        mouse_listener = None
+    if keyboard_listener is not None:
+        keyboard_listener.stop()
+        keyboard_listener = None
+    if update_log:
+        update_log("Flight recorder stopped.")
+    else:
+        print("Flight recorder stopped.")
+
+def on_move(x, y):
+    """Handle mouse move events."""
+    global last_mouse_move_time, last_position
+    last_position = (x, y)
+    current_time = time.time()
+    if current_time - last_mouse_move_time >= recording.mouse_move_interval:
+        add_event("move", x=x, y=y)
+        last_mouse_move_time = current_time
+
+def on_click(x, y, button, pressed):
+    """Handle mouse click events."""
+    add_event("button_press" if pressed else "button_release", x=x, y=y, button=button.name)
+
+def on_scroll(x, y, dx, dy):
+    """Handle mouse scroll events."""
+    add_event("scroll", x=x, y=y, dx=dx, dy=dy)
+
+def on_press(key):
+    """Handle keyboard key press events."""
+    add_event("key_press", key=get_key_name(key))
+
+def on_release(key):
+    """Handle keyboard key release events."""
+    add_event("key_release", key=get_key_name(key))
+
+def snapshot(minutes=10):
+    """Return the last minutes of input as a list of actions that can be replayed.
+
+    Returns an empty list if nothing was captured in that time.
+    """
+    now = time.time()
+    cutoff = now - minutes * 60
+    with events_lock:
+        captured = list(events)
+    window = [event for event in captured if event["timestamp"] >= cutoff]
+    if not window:
+        return []
+
+    # Start where the mouse was when the window begins, as far as the ring knows
+    start_x, start_y = last_position
+    earlier = [event for event in captured if event["timestamp"] < cutoff and "x" in event]
+    later = [event for event in window if "x" in event]
+    if earlier:
+        start_x, start_y = earlier[-1]["x"], earlier[-1]["y"]
+    elif later:
+        start_x, start_y = later[0]["x"], later[0]["y"]
+
+    start_timestamp = window[0]["timestamp"]
+    actions = [{"type": "start", "timestamp": start_timestamp, "x": start_x, "y": start_y}]
+    previous_timestamp = start_timestamp
+    for event in window:
+        actions.append({**event, "delay": event["timestamp"] - previous_timestamp})
+        previous_timestamp = event["timestamp"]
+    end_x, end_y = last_position
+    actions.append({"type": "end", "timestamp": previous_timestamp, "x": end_x, "y": end_y})
+    return actions
+
+def save_snapshot(filename, minutes=10, actions=None):
+    """Save the last minutes of input (or an already taken snapshot) to a JSON file.
+
+    Nothing is written if nothing was captured.
+    """
+    if actions is None:
+        actions = snapshot(minutes)
+    if not actions:
+        print(f"Nothing captured in the last {minutes} minutes.")
+        return actions
+    with open(filename, "w") as f:
+        json.dump(actions, f)
+    print(f"Saved {len(actions)} actions from the last {minutes} minutes to {filename}")
+    return actions
@@ -11,6 +11,10 @@ import os
 import keyboard  # Using the 'keyboard' module for keyboard events
 
 import recording  # Importing the entire module
+import timing
+import flight_recorder
+import columnar_export
+import analytics
 
 class MousePad(ctk.CTk):
     def __init__(self):
@@ -35,6 +39,11 @@ class MousePad(ctk.CTk):
         self.log_text = None
         self.play_button = None
         self.replay_speed = 1.0
+        self.compress_idle = False
+        self.idle_threshold = 2.0  # Gaps longer than this (in seconds) are shortened when compressing
+        self.batch_typing = False
+        self.typing_interval = 0.0  # Seconds between characters of batched text
+        self.snapshot_minutes = 10  # How much flight recorder history to save
 
         # Default keyboard shortcuts
         self.shortcuts = {
@@ -72,6 +81,8 @@ class MousePad(ctk.CTk):
         # Stop recording if active
         if self.is_recording:
             recording.stop_recording()
+        if flight_recorder.is_running:
+            flight_recorder.stop_flight_recorder()
         self.destroy()
 
     def register_shortcuts(self):
@@ -158,6 +169,43 @@ class MousePad(ctk.CTk):
             width=200, fg_color=self.button_color, command=self.show_settings)
         settings_button.grid(row=3, column=0, pady=button_padding, padx=20, sticky="ew")
 
+        self.flight_button = ctk.CTkButton(
+            self.current_frame, font=button_font, height=50, width=200,
+            fg_color=self.recording_color if flight_recorder.is_running else self.button_color,
+            text="Stop Flight Recorder" if flight_recorder.is_running else "Start Flight Recorder",
+            command=self.toggle_flight_recorder)
+        self.flight_button.grid(row=4, column=0, pady=button_padding, padx=20, sticky="ew")
+
+        snapshot_button = ctk.CTkButton(
+            self.current_frame, text=f"Save Last {self.snapshot_minutes} Minutes", font=button_font,
+            height=50, width=200, fg_color=self.button_color, command=self.save_flight_snapshot)
+        snapshot_button.grid(row=5, column=0, pady=button_padding, padx=20, sticky="ew")
+
+    def toggle_flight_recorder(self):
+        """Start or stop the background flight recorder."""
+        if flight_recorder.is_running:
+            flight_recorder.stop_flight_recorder(self.update_log)
+            self.flight_button.configure(fg_color=self.button_color, text="Start Flight Recorder")
+        else:
+            flight_recorder.start_flight_recorder(self.update_log)
+            self.flight_button.configure(fg_color=self.recording_color, text="Stop Flight Recorder")
+
+    def save_flight_snapshot(self):
+        """Save the last minutes captured by the flight recorder to a file."""
+        actions = flight_recorder.snapshot(self.snapshot_minutes)
+        if not actions:
+            self.update_log(f"Nothing captured in the last {self.snapshot_minutes} minutes.")
+            return
+        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
+        if filename:
+            try:
+                flight_recorder.save_snapshot(filename, self.snapshot_minutes, actions)
+                self.update_log(f"Saved {len(actions)} actions from the flight recorder to {filename}")
+            except Exception as e:
+                self.update_log(f"Error saving snapshot: {e}")
+        else:
+            self.update_log("Save canceled.")
+
     def show_init_recording_state(self):
         """Initial state where user can start recording."""
         self.clear_frame()
@@ -199,7 +247,7 @@ class MousePad(ctk.CTk):
         speed_label.grid(row=5, column=0, pady=(10, 0), padx=20, sticky="ew")
 
         self.speed_slider = ctk.CTkSlider(
-            self.current_frame, from_=0.5, to=2.0, number_of_steps=15, command=self.update_speed)
+            self.current_frame, from_=0.5, to=10.0, number_of_steps=38, command=self.update_speed)
         self.speed_slider.set(1.0)
         self.speed_slider.grid(row=6, column=0, pady=5, padx=20, sticky="ew")
 
@@ -210,17 +258,38 @@ class MousePad(ctk.CTk):
             command=self.toggle_mouse_moves)
         mouse_move_checkbox.grid(row=7, column=0, pady=10, padx=20, sticky="ew")
 
+        # Option to capture input in a separate process
+        self.capture_process_var = ctk.IntVar(value=int(recording.capture_in_process))
+        capture_process_checkbox = ctk.CTkCheckBox(
+            self.current_frame, text="Capture in Separate Process", variable=self.capture_process_var,
+            command=self.toggle_capture_process)
+        capture_process_checkbox.grid(row=8, column=0, pady=10, padx=20, sticky="ew")
+
+        # Option to shorten long idle gaps during replay
+        self.compress_idle_var = ctk.IntVar(value=int(self.compress_idle))
+        compress_idle_checkbox = ctk.CTkCheckBox(
+            self.current_frame, text="Compress Idle Gaps", variable=self.compress_idle_var,
+            command=self.toggle_compress_idle)
+        compress_idle_checkbox.grid(row=9, column=0, pady=10, padx=20, sticky="ew")
+
+        # Option to replay plain typing as batched text
+        self.batch_typing_var = ctk.IntVar(value=int(self.batch_typing))
+        batch_typing_checkbox = ctk.CTkCheckBox(
+            self.current_frame, text="Batch Typed Text", variable=self.batch_typing_var,
+            command=self.toggle_batch_typing)
+        batch_typing_checkbox.grid(row=10, column=0, pady=10, padx=20, sticky="ew")
+
         # Button to access the action list
         action_list_button = ctk.CTkButton(
             self.current_frame, text="Edit Actions", font=("Nunito", 18), height=50,
             fg_color=self.button_color, command=self.show_action_list)
-        action_list_button.grid(row=8, column=0, pady=10, padx=20, sticky="ew")
+        action_list_button.grid(row=11, column=0, pady=10, padx=20, sticky="ew")
 
         # Button to select recording area
         area_button = ctk.CTkButton(
             self.current_frame, text="Set Recording Area", font=("Nunito", 18), height=50,
             fg_color=self.button_color, command=self.select_recording_area)
-        area_button.grid(row=9, column=0, pady=10, padx=20, sticky="ew")
+        area_button.grid(row=12, column=0, pady=10, padx=20, sticky="ew")
 
         self.current_frame.log_text_placeholder = True
 
@@ -230,6 +299,30 @@ class MousePad(ctk.CTk):
         recording.set_record_mouse_moves(value)
         self.update_log(f"Record Mouse Movements set to {value}")
 
+    def toggle_capture_process(self):
+        """Toggle capturing input in a separate process."""
+        value = bool(self.capture_process_var.get())
+        recording.set_capture_in_process(value)
+        self.update_log(f"Capture in Separate Process set to {value}")
+
+    def toggle_compress_idle(self):
+        """Toggle shortening of long idle gaps during replay."""
+        self.compress_idle = bool(self.compress_idle_var.get())
+        self.update_log(f"Compress Idle Gaps set to {self.compress_idle}")
+
+    def toggle_batch_typing(self):
+        """Toggle replaying plain typing as batched text."""
+        self.batch_typing = bool(self.batch_typing_var.get())
+        self.update_log(f"Batch Typed Text set to {self.batch_typing}")
+
+    def build_timing_policies(self):
+        """Build the list of timing policies from the current replay settings."""
+        policies = []
+        if self.compress_idle:
+            policies.append(timing.cap_idle(self.idle_threshold))
+        policies.append(timing.scale_speed(self.replay_speed))
+        return policies
+
     def toggle_recording(self):
         """Toggle between starting and stopping recording."""
         if self.is_recording:
@@ -257,10 +350,16 @@ class MousePad(ctk.CTk):
 
     def save_recording(self):
         """Save the recorded actions to a file."""
-        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("Parquet files", "*.parquet"),
+                       ("Arrow files", "*.arrow"), ("NumPy files", "*.npz")])
         if filename:
             try:
-                recording.save_actions(filename)
+                if os.path.splitext(filename)[1].lower() in columnar_export.FORMATS:
+                    recording.export_actions(filename)
+                else:
+                    recording.save_actions(filename)
                 self.update_log(f"Recording saved as {filename}")
             except Exception as e:
                 self.update_log(f"Error saving recording: {e}")
@@ -273,7 +372,10 @@ class MousePad(ctk.CTk):
         if tkmessagebox.askyesno("Confirm Replay", "Are you sure you want to replay the recorded actions? This may interfere with your control of the system. Press 'Esc' to stop replay."):
             self.update_log("Replaying recorded actions...")
             # Start replay in a separate thread
-            threading.Thread(target=recording.replay_actions, args=(1, self.replay_speed, self.update_log)).start()
+            threading.Thread(
+                target=recording.replay_actions,
+                args=(1, self.replay_speed, self.update_log, self.build_timing_policies(),
+                      self.batch_typing, self.typing_interval)).start()
         else:
             self.update_log("Replay canceled.")
 
@@ -338,6 +440,8 @@ class MousePad(ctk.CTk):
                     "3. Click 'Stop' to end the recording.\n"
                     "4. Click 'Save Recording' to save your recording for future use.\n"
                     "5. Load a recording and click 'Play' to replay the actions.\n\n"
+                    "Press 'F8' while recording to add a sync point: replay waits until the\n"
+                    "screen around the cursor looks the same before continuing.\n\n"
                     "Press 'Esc' during replay to stop it immediately.\n\n"
                     "Keyboard Shortcuts:\n"
                     f"- Record: {self.shortcuts['record']}\n"
@@ -447,6 +551,54 @@ class MousePad(ctk.CTk):
             fg_color=self.button_color, command=self.show_init_recording_state)
         back_button.pack(side='right', padx=5)
 
+        stats_button = ctk.CTkButton(
+            button_frame, text="Statistics", font=("Nunito", 14),
+            fg_color=self.button_color, command=self.show_statistics)
+        stats_button.pack(side='right', padx=5)
+
+    def show_statistics(self):
+        """Display a heatmap preview and statistics for the recorded actions."""
+        actions = recording.get_recorded_actions()
+        if not actions:
+            self.update_log("No actions to analyze.")
+            return
+        try:
+            stats = analytics.get_stats(actions, (self.winfo_screenwidth(), self.winfo_screenheight()))
+        except Exception as e:
+            self.update_log(f"Error computing statistics: {e}")
+            return
+
+        self.clear_frame()
+        self.current_frame = ctk.CTkFrame(self, fg_color='#262E3F')
+        self.current_frame.grid(row=0, column=0, padx=20, pady=20, sticky="nsew")
+        self.current_frame.grid_columnconfigure(0, weight=1)
+
+        # Keep a reference to the image so Tkinter does not discard it
+        self.heatmap_image = tkinter.PhotoImage(data=analytics.to_ppm(analytics.render_preview(stats)))
+        heatmap_label = tkinter.Label(self.current_frame, image=self.heatmap_image, bg='#262E3F')
+        heatmap_label.grid(row=0, column=0, pady=10, padx=10)
+
+        total, clicks, moves, key_presses, duration = stats["summary"]
+        top_keys = ", ".join(f"{key} ({count})" for key, count in zip(stats["keys"][:5], stats["key_counts"][:5]))
+        peak_rate = stats["event_rate"].max() if len(stats["event_rate"]) else 0
+        stats_text = (f"Actions: {int(total)} over {duration:.1f} s\n"
+                      f"Clicks: {int(clicks)}   Moves: {int(moves)}   Key presses: {int(key_presses)}\n"
+                      f"Peak rate: {peak_rate} actions per {analytics.rate_bin:g} s\n"
+                      f"Top keys: {top_keys or 'none'}\n"
+                      "Longest dwell:\n")
+        for area, seconds in analytics.top_dwell_regions(stats, 3):
+            stats_text += f"  {area}: {seconds:.1f} s\n"
+
+        stats_label = ctk.CTkLabel(
+            self.current_frame, text=stats_text, font=("Nunito", 12),
+            text_color="white", justify="left")
+        stats_label.grid(row=1, column=0, padx=10, pady=10, sticky="w")
+
+        back_button = ctk.CTkButton(
+            self.current_frame, text="Back", font=("Nunito", 14),
+            fg_color=self.button_color, command=self.show_action_list)
+        back_button.grid(row=2, column=0, pady=10, padx=20, sticky="ew")
+
     def edit_action(self):
         """Edit the selected action."""
         selected_item = self.action_tree.selection()
@@ -481,8 +633,12 @@ class MousePad(ctk.CTk):
                     try:
                         if key in ['x', 'y', 'dx', 'dy']:
                             action[key] = float(entry.get())
-                        elif key == 'delay':
+                        elif key in ['delay', 'timeout', 'interval', 'end_timestamp']:
                             action[key] = float(entry.get())
+                        elif key == 'threshold':
+                            action[key] = int(entry.get())
+                        elif key == 'region':
+                            action[key] = [int(v) for v in entry.get().strip('[]() ').split(',')]
                         else:
                             action[key] = entry.get()
                     except ValueError:
@@ -0,0 +1,18 @@
+# input_helpers.py
+
+# Small helpers shared by the recorders. This module must not import anything
+# heavy, because the capture child process imports it on startup.
+
+def get_key_name(key):
+    """Get the string representation of the key."""
+    if hasattr(key, 'char') and key.char is not None:
+        return key.char
+    else:
+        return str(key).replace('Key.', '')
+
+def within_area(area, x, y):
+    """Check if the coordinates are within the area (x1, y1, x2, y2), or anywhere if area is None."""
+    if area is None:
+        return True
+    x1, y1, x2, y2 = area
+    return x1 <= x <= x2 and y1 <= y <= y2
@@ -0,0 +1,78 @@
+# keystroke_batch.py
+
+# Keys that count as modifiers; typing runs are only batched while none of these are held
+MODIFIER_KEYS = {
+    "shift", "shift_l", "shift_r", "ctrl", "ctrl_l", "ctrl_r",
+    "alt", "alt_l", "alt_r", "alt_gr", "cmd", "cmd_l", "cmd_r"
+}
+
+def key_text(key_name):
+    """Return the text typed by a key, or None if it is not a plain printable key."""
+    if key_name == "space":
+        return " "
+    if isinstance(key_name, str) and len(key_name) == 1 and " " <= key_name <= "~":
+        return key_name
+    return None
+
+def _scan_run(actions, start):
+    """Scan a run of printable key edges starting at index start.
+
+    Returns the index just past the run and the text it types. The run is cut at
+    the last point where every key pressed inside it has been released again.
+    """
+    held = set()
+    text = ""
+    end, end_text = start, ""
+    for j in range(start, len(actions)):
+        action = actions[j]
+        if action["type"] not in ("key_press", "key_release"):
+            break
+        char = key_text(action["key"])
+        if char is None:
+            break
+        if action["type"] == "key_press":
+            held.add(action["key"])
+            text += char
+        elif action["key"] in held:
+            held.discard(action["key"])
+        else:
+            break  # Released a key that was pressed before the run started
+        if not held:
+            end, end_text = j + 1, text
+    return end, end_text
+
+def coalesce_keystrokes(actions, interval=0.0, min_length=2):
+    """Replace runs of plain typing with batched "type_text" actions.
+
+    Runs of at least min_length characters typed while no modifier is held become
+    a single action that types the text with the given per-character interval.
+    Modifiers, special keys and all other actions are kept as they are.
+    """
+    result = []
+    held_modifiers = set()
+    i = 0
+    while i < len(actions):
+        if not held_modifiers:
+            end, text = _scan_run(actions, i)
+            if len(text) >= min_length:
+                first, last = actions[i], actions[end - 1]
+                batched = {
+                    "type": "type_text",
+                    "timestamp": first["timestamp"],
+                    "end_timestamp": last["timestamp"],
+                    "text": text,
+                    "interval": interval
+                }
+                if "delay" in first:
+                    batched["delay"] = first["delay"]
+                result.append(batched)
+                i = end
+                continue
+        action = actions[i]
+        if action["type"] == "key_press" and action["key"] in MODIFIER_KEYS:
+            held_modifiers.add(action["key"])
+        elif action["type"] == "key_release":
+            held_modifiers.discard(action["key"])
+        result.append(action)
+        i += 1
+    return result
@@ -1,7 +1,9 @@
-from gui import MousePad
-
 # Main entry point for the application
 if __name__ == "__main__":
+    # Imported here so that spawned capture processes, which re-run this
+    # module under another name, do not load the whole GUI
+    from gui import MousePad
+
     # Initialize the MousePad GUI
     app = MousePad()
 
@@ -6,6 +6,12 @@ import json
 import threading
 from pynput import mouse, keyboard
 from emergency_stop import start_emergency_listener, stop_emergency_listener, stop_replay
+import screen_sync
+import timing
+import keystroke_batch
+import capture_process
+import columnar_export
+from input_helpers import get_key_name, within_area
 
 # Global variables to track recording state and actions
 is_recording = False
@@ -18,22 +24,24 @@ last_mouse_move_time = 0  # For throttling mouse move events
 mouse_move_interval = 0.1  # Record mouse moves every 0.1 seconds
 click_count = 0  # To track the number of clicks for visual markers
 record_mouse_moves = True  # Set to True to record mouse movements
+sync_key = keyboard.Key.f8  # Pressing this key while recording captures a screen sync point
+capture_in_process = False  # Set to True to run the listeners in a separate process
+capture = None  # CaptureProcess used when capturing in a separate process
+drain_thread = None
+drain_interval = 0.02  # Seconds between reads of the shared event ring
 
-def record_action(action_type, **kwargs):
+def record_action(action_type, timestamp=None, **kwargs):
     """Record an action with its type, timestamp, and additional data."""
     action = {
         "type": action_type,
-        "timestamp": time.time(),
+        "timestamp": time.time() if timestamp is None else timestamp,
         **kwargs
     }
     recorded_actions.append(action)
 
 def is_within_area(x, y):
     """Check if the coordinates are within the recording area."""
-    if recording_area is None:
-        return True
-    x1, y1, x2, y2 = recording_area
-    return x1 <= x <= x2 and y1 <= y <= y2
+    return within_area(recording_area, x, y)
 
 def set_recording_area(area):
     """Set the recording area."""
@@ -45,6 +53,11 @@ def set_record_mouse_moves(value):
     global record_mouse_moves
     record_mouse_moves = value
 
+def set_capture_in_process(value):
+    """Set whether to capture input in a separate process."""
+    global capture_in_process
+    capture_in_process = value
+
 def draw_marker(x, y, click_number):
     """Draw a visual marker at the click position."""
     # For simplicity, we will not implement this function as Tkinter is not thread-safe
@@ -68,6 +81,10 @@ def start_recording(update_gui_state=None, update_log=None):
     if update_gui_state:
         update_gui_state(is_recording=True)
 
+    if capture_in_process:
+        start_capture_process(update_gui_state, update_log)
+        return
+
     # Start mouse listener
     mouse_listener = mouse.Listener(on_move=on_move, on_click=on_click, on_scroll=on_scroll)
     mouse_listener.start()
@@ -81,6 +98,9 @@ def stop_recording(update_gui_state=None, update_log=None):
     global is_recording, mouse_listener, keyboard_listener
     is_recording = False
 
+    if capture is not None:
+        stop_capture_process(update_log)
+
     # Capture the ending position of the mouse
     end_x, end_y = pyautogui.position()
     record_action("end", x=end_x, y=end_y)
@@ -100,6 +120,78 @@ def stop_recording(update_gui_state=None, update_log=None):
     if update_gui_state:
         update_gui_state(is_recording=False)
 
+def start_capture_process(update_gui_state=None, update_log=None):
+    """Start capturing in a child process and draining its events in the background."""
+    global is_recording, capture, drain_thread
+    capture = capture_process.CaptureProcess(
+        recording_area, record_mouse_moves, mouse_move_interval, get_key_name(sync_key), pyautogui.size())
+    try:
+        capture.start()
+    except Exception as e:
+        is_recording = False
+        capture.close()
+        capture = None
+        if update_log:
+            update_log(f"Could not start the capture process: {e}")
+        else:
+            print(f"Could not start the capture process: {e}")
+        if update_gui_state:
+            update_gui_state(is_recording=False)
+        return
+    drain_thread = threading.Thread(target=drain_capture, daemon=True)
+    drain_thread.start()
+    if update_log:
+        update_log("Capturing input in a separate process.")
+    else:
+        print("Capturing input in a separate process.")
+
+def drain_capture():
+    """Move events from the capture process into the recorded actions until recording stops."""
+    while is_recording:
+        record_captured_events(capture.drain())
+        time.sleep(drain_interval)
+
+def record_captured_events(events):
+    """Record a batch of events read from the capture process."""
+    global start_time, click_count
+    for event in events:
+        timestamp = event['timestamp']
+        delay = timestamp - start_time
+        if event['type'] == "sync":
+            # The child grabbed the region when the key was pressed and sent its hash
+            region = screen_sync.region_around(event['x'], event['y'], capture.screen_size)
+            record_action("sync", timestamp, delay=delay, **screen_sync.sync_point(region, event['name']))
+            start_time = timestamp
+            continue
+        if event['type'] == "move":
+            record_action("move", timestamp, x=event['x'], y=event['y'], delay=delay)
+        elif event['type'] in ("button_press", "button_release"):
+            record_action(event['type'], timestamp, x=event['x'], y=event['y'], button=event['name'], delay=delay)
+            if event['type'] == "button_press":
+                click_count += 1
+        elif event['type'] == "scroll":
+            record_action("scroll", timestamp, x=event['x'], y=event['y'], dx=event['dx'], dy=event['dy'], delay=delay)
+        else:
+            record_action(event['type'], timestamp, key=event['name'], delay=delay)
+        start_time = timestamp
+
+def stop_capture_process(update_log=None):
+    """Stop the capture process and record the events still waiting in the ring."""
+    global capture, drain_thread
+    if drain_thread is not None:
+        drain_thread.join()
+        drain_thread = None
+    capture.stop()
+    record_captured_events(capture.drain())
+    dropped = capture.dropped
+    capture.close()
+    capture = None
+    if dropped:
+        if update_log:
+            update_log(f"Warning: {dropped} events were dropped because the capture buffer was full.")
+        else:
+            print(f"Warning: {dropped} events were dropped because the capture buffer was full.")
+
 def on_move(x, y):
     """Handle mouse move events."""
     global is_recording, start_time, last_mouse_move_time
@@ -133,10 +225,21 @@ def on_scroll(x, y, dx, dy):
         record_action("scroll", x=x, y=y, dx=dx, dy=dy, delay=delay)
         start_time = time.time()
 
+def add_sync_point(timestamp=None):
+    """Record a sync point for the screen region around the mouse cursor."""
+    global start_time
+    timestamp = time.time() if timestamp is None else timestamp
+    delay = timestamp - start_time
+    x, y = pyautogui.position()
+    record_action("sync", timestamp, delay=delay, **screen_sync.capture_sync_point(x, y, pyautogui.size()))
+    start_time = timestamp
+
 def on_press(key):
     """Handle keyboard key press events."""
     global is_recording, start_time
-    if is_recording:
+    if is_recording and key == sync_key:
+        add_sync_point()
+    elif is_recording:
         delay = time.time() - start_time
         key_name = get_key_name(key)
         record_action("key_press", key=key_name, delay=delay)
@@ -145,87 +248,107 @@ def on_press(key):
 def on_release(key):
     """Handle keyboard key release events."""
     global is_recording, start_time
-    if is_recording:
+    if is_recording and key != sync_key:
         delay = time.time() - start_time
         key_name = get_key_name(key)
         record_action("key_release", key=key_name, delay=delay)
         start_time = time.time()
 
-def get_key_name(key):
-    """Get the string representation of the key."""
-    if hasattr(key, 'char') and key.char is not None:
-        return key.char
-    else:
-        return str(key).replace('Key.', '')
+def replay_actions(loop_count=1, speed_factor=1.0, update_log=None, timing_policies=None,
+                   coalesce_typing=False, typing_interval=0.0):
+    """Replay the recorded actions with an optional loop count and speed factor.
 
-def replay_actions(loop_count=1, speed_factor=1.0, update_log=None):
-    """Replay the recorded actions with an optional loop count and speed factor."""
+    timing_policies is a list of policies from the timing module. When it is not
+    given, the recorded gaps are only divided by speed_factor. With coalesce_typing,
+    runs of plain typing are replayed as text with typing_interval between characters.
+    pyautogui's pause after every call is turned off while replaying, so the schedule
+    is the only source of waits, apart from the 0.1 second glide to the start and end.
+    """
+    actions = recorded_actions
+    if coalesce_typing:
+        actions = keystroke_batch.coalesce_keystrokes(actions, typing_interval)
+    if timing_policies is None:
+        timing_policies = [timing.scale_speed(speed_factor)]
+    gaps = timing.build_schedule(actions, timing_policies)
     if update_log:
-        update_log(f"Replaying {len(recorded_actions)} actions, {loop_count} times at {speed_factor}x speed...")
+        update_log(f"Replaying {len(actions)} actions, {loop_count} times at {speed_factor}x speed...")
     else:
-        print(f"Replaying {len(recorded_actions)} actions, {loop_count} times at {speed_factor}x speed...")
-    for _ in range(loop_count):
-        if not recorded_actions:
-            if update_log:
-                update_log("No actions to replay.")
-            else:
-                print("No actions to replay.")
-            return
-        # Start emergency listener
-        start_emergency_listener()
-        try:
-            for i, action in enumerate(recorded_actions):
-                # Check for emergency stop
+        print(f"Replaying {len(actions)} actions, {loop_count} times at {speed_factor}x speed...")
+    # The schedule decides every wait, so turn off the pause pyautogui adds after each call
+    previous_pause = pyautogui.PAUSE
+    pyautogui.PAUSE = 0
+    try:
+        for _ in range(loop_count):
+            if not actions:
+                if update_log:
+                    update_log("No actions to replay.")
+                else:
+                    print("No actions to replay.")
+                return
+            # Start emergency listener
+            start_emergency_listener()
+            try:
+                for i, action in enumerate(actions):
+                    # Check for emergency stop
+                    if stop_replay:
+                        if update_log:
+                            update_log("Replay stopped by user.")
+                        else:
+                            print("Replay stopped by user.")
+                        break
+                    # Time to wait before executing this action
+                    time_to_wait = gaps[i]
+                    # Sync points wait for the screen instead of sleeping through the recorded gap
+                    if action['type'] == "sync":
+                        if not screen_sync.wait_for_match(action):
+                            if update_log:
+                                update_log(f"Sync point {i} timed out, continuing.")
+                            else:
+                                print(f"Sync point {i} timed out, continuing.")
+                        continue
+                    time.sleep(time_to_wait)
+                    # Execute the action based on its type
+                    try:
+                        if action['type'] == "start":
+                            pyautogui.moveTo(action['x'], action['y'], duration=0.1)
+                        elif action['type'] == "move":
+                            pyautogui.moveTo(action['x'], action['y'])
+                        elif action['type'] == "button_press":
+                            pyautogui.mouseDown(x=action['x'], y=action['y'], button=action['button'])
+                        elif action['type'] == "button_release":
+                            pyautogui.mouseUp(x=action['x'], y=action['y'], button=action['button'])
+                        elif action['type'] == "scroll":
+                            pyautogui.scroll(int(action['dy']), x=action['x'], y=action['y'])
+                        elif action['type'] == "key_press":
+                            pyautogui.keyDown(action['key'])
+                        elif action['type'] == "key_release":
+                            pyautogui.keyUp(action['key'])
+                        elif action['type'] == "type_text":
+                            pyautogui.write(action['text'], interval=action['interval'])
+                        elif action['type'] == "end":
+                            pyautogui.moveTo(action['x'], action['y'], duration=0.1)
+                        # Add other action types as needed
+                    except Exception as e:
+                        if update_log:
+                            update_log(f"Error executing action {action}: {e}")
+                        else:
+                            print(f"Error executing action {action}: {e}")
+            except Exception as e:
+                if update_log:
+                    update_log(f"Replay stopped due to error: {e}")
+                else:
+                    print(f"Replay stopped due to error: {e}")
+            finally:
+                # Stop emergency listener after each loop
+                stop_emergency_listener()
                 if stop_replay:
-                    if update_log:
-                        update_log("Replay stopped by user.")
-                    else:
-                        print("Replay stopped by user.")
                     break
-                # Calculate time to wait before executing this action
-                if i == 0:
-                    time_to_wait = 0
+                if update_log:
+                    update_log("Replay iteration finished.")
                 else:
-                    time_to_wait = (action['timestamp'] - recorded_actions[i - 1]['timestamp']) / speed_factor
-                time.sleep(time_to_wait)
-                # Execute the action based on its type
-                try:
-                    if action['type'] == "start":
-                        pyautogui.moveTo(action['x'], action['y'], duration=0.1)
-                    elif action['type'] == "move":
-                        pyautogui.moveTo(action['x'], action['y'])
-                    elif action['type'] == "button_press":
-                        pyautogui.mouseDown(x=action['x'], y=action['y'], button=action['button'])
-                    elif action['type'] == "button_release":
-                        pyautogui.mouseUp(x=action['x'], y=action['y'], button=action['button'])
-                    elif action['type'] == "scroll":
-                        pyautogui.scroll(int(action['dy']), x=action['x'], y=action['y'])
-                    elif action['type'] == "key_press":
-                        pyautogui.keyDown(action['key'])
-                    elif action['type'] == "key_release":
-                        pyautogui.keyUp(action['key'])
-                    elif action['type'] == "end":
-                        pyautogui.moveTo(action['x'], action['y'], duration=0.1)
-                    # Add other action types as needed
-                except Exception as e:
-                    if update_log:
-                        update_log(f"Error executing action {action}: {e}")
-                    else:
-                        print(f"Error executing action {action}: {e}")
-        except Exception as e:
-            if update_log:
-                update_log(f"Replay stopped due to error: {e}")
-            else:
-                print(f"Replay stopped due to error: {e}")
-        finally:
-            # Stop emergency listener after each loop
-            stop_emergency_listener()
-            if stop_replay:
-                break
-            if update_log:
-                update_log("Replay iteration finished.")
-            else:
-                print("Replay iteration finished.")
+                    print("Replay iteration finished.")
+    finally:
+        pyautogui.PAUSE = previous_pause
     if update_log:
         update_log("Replay finished.")
     else:
@@ -237,6 +360,11 @@ def save_actions(filename="actions.json"):
         json.dump(recorded_actions, f)
     print(f"Actions saved to {filename}")
 
+def export_actions(filename="actions.parquet"):
+    """Export recorded actions as a columnar table (Parquet, Arrow or NumPy .npz)."""
+    columnar_export.export_actions(recorded_actions, filename)
+    print(f"Actions exported to {filename}")
+
 def load_actions(filename="actions.json"):
     """Load actions from a JSON file."""
     global recorded_actions
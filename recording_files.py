@@ -0,0 +1,55 @@
+# recording_files.py
+
+# Helpers for finding and checking recording files, shared by the batch tool and
+# the columnar export. This module must stay light, because the GUI imports it
+# through the export.
+import os
+
+# Fields every action of a given type needs to be replayed
+REQUIRED_FIELDS = {
+    "start": ("x", "y"),
+    "end": ("x", "y"),
+    "move": ("x", "y"),
+    "button_press": ("x", "y", "button"),
+    "button_release": ("x", "y", "button"),
+    "scroll": ("x", "y", "dy"),
+    "key_press": ("key",),
+    "key_release": ("key",),
+    "type_text": ("text", "interval"),
+    "sync": ("region", "hash")
+}
+
+def validate_actions(actions):
+    """Return a list of problems that would stop the actions from replaying."""
+    if not isinstance(actions, list):
+        return ["Recording is not a list of actions."]
+    errors = []
+    previous_timestamp = None
+    for i, action in enumerate(actions):
+        if not isinstance(action, dict) or "type" not in action:
+            errors.append(f"Action {i} has no type.")
+            continue
+        if action["type"] not in REQUIRED_FIELDS:
+            errors.append(f"Action {i} has unknown type {action['type']!r}.")
+            continue
+        missing = [field for field in REQUIRED_FIELDS[action["type"]] if field not in action]
+        if missing:
+            errors.append(f"Action {i} ({action['type']}) is missing {', '.join(missing)}.")
+        timestamp = action.get("timestamp")
+        if not isinstance(timestamp, (int, float)):
+            errors.append(f"Action {i} has no valid timestamp.")
+            continue
+        if previous_timestamp is not None and timestamp < previous_timestamp:
+            errors.append(f"Action {i} is earlier than the action before it.")
+        previous_timestamp = timestamp
+    return errors
+
+def find_recordings(directory):
+    """Find all JSON recordings below a directory."""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            # Skip temporary files left by an interrupted atomic write
+            if name.endswith(".json") and not name.startswith(".tmp-"):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
@@ -0,0 +1,82 @@
+# screen_sync.py
+
+import time
+from PIL import Image, ImageGrab
+import emergency_stop
+
+# Settings for screen synchronization points
+hash_size = 8  # Hash is computed on a (hash_size + 1) x hash_size grayscale thumbnail
+default_threshold = 6  # Maximum Hamming distance between hashes to count as a match
+default_timeout = 30.0  # Seconds to wait for a match before giving up
+poll_interval = 0.05  # Seconds between region grabs while waiting
+region_size = 200  # Width and height of the region captured around the mouse
+
+def image_hash(image):
+    """Compute a difference hash (dHash) of an image as an integer."""
+    # Downscale first so the comparison is cheap and ignores small rendering noise
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hash_to_hex(value):
+    """Convert an integer hash to its hex string representation."""
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+def hamming_distance(a, b):
+    """Count the number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+def grab_region(region):
+    """Grab only the given screen region (left, top, width, height)."""
+    left, top, width, height = (int(v) for v in region)
+    # ImageGrab asks the platform for just this box instead of the full screen
+    return ImageGrab.grab(bbox=(left, top, left + width, top + height))
+
+def region_hash(region):
+    """Grab a screen region and return its hash."""
+    return image_hash(grab_region(region))
+
+def region_around(x, y, screen_size, size=None):
+    """Return a square region centered on (x, y), clipped to the screen size (width, height)."""
+    size = size or region_size
+    screen_width, screen_height = screen_size
+    width = min(size, screen_width)
+    height = min(size, screen_height)
+    left = min(max(int(x) - width // 2, 0), screen_width - width)
+    top = min(max(int(y) - height // 2, 0), screen_height - height)
+    return [left, top, width, height]
+
+def sync_point(region, hash_hex):
+    """Return the data for a sync action with the given region and reference hash."""
+    return {
+        "region": region,
+        "hash": hash_hex,
+        "threshold": default_threshold,
+        "timeout": default_timeout
+    }
+
+def capture_sync_point(x, y, screen_size, size=None):
+    """Capture the region around (x, y) and return the data for a sync action."""
+    region = region_around(x, y, screen_size, size)
+    return sync_point(region, hash_to_hex(region_hash(region)))
+
+def wait_for_match(action, timeout=None):
+    """Wait until the action's region matches its reference.
+
+    Returns True on a match, False on timeout or emergency stop.
+    """
+    target = int(action["hash"], 16)
+    threshold = action.get("threshold", default_threshold)
+    timeout = action.get("timeout", default_timeout) if timeout is None else timeout
+    deadline = time.time() + timeout
+    while True:
+        if hamming_distance(region_hash(action["region"]), target) <= threshold:
+            return True
+        if emergency_stop.stop_replay or time.time() >= deadline:
+            return False
+        time.sleep(poll_interval)
@@ -0,0 +1,66 @@
+# timing.py
+
+# Timing policies for replay.
+#
+# A policy is a function that takes the list of actions and the list of gaps
+# (seconds to wait before each action) and returns a new list of gaps.
+# Policies are applied in order by build_schedule, so they can be combined, e.g.
+#     build_schedule(actions, [cap_idle(2.0), scale_speed(4.0), min_gap(0.02)])
+
+def compute_gaps(actions):
+    """Compute the recorded gap before each action from the timestamps."""
+    gaps = []
+    for i, action in enumerate(actions):
+        if i == 0:
+            gaps.append(0.0)
+        else:
+            previous = actions[i - 1]
+            # Batched actions span time, so measure from where the previous one ended
+            gaps.append(max(action['timestamp'] - previous.get('end_timestamp', previous['timestamp']), 0.0))
+    return gaps
+
+def scale_speed(factor):
+    """Divide every gap by the speed factor."""
+    if factor <= 0:
+        raise ValueError("Speed factor must be positive.")
+    def policy(actions, gaps):
+        return [gap / factor for gap in gaps]
+    return policy
+
+def cap_idle(threshold, cap=None):
+    """Shorten gaps longer than threshold to cap (defaults to the threshold)."""
+    cap = threshold if cap is None else cap
+    def policy(actions, gaps):
+        return [cap if gap > threshold else gap for gap in gaps]
+    return policy
+
+def min_gap(seconds):
+    """Make sure there is at least the given time between consecutive actions."""
+    def policy(actions, gaps):
+        return [gap if i == 0 else max(gap, seconds) for i, gap in enumerate(gaps)]
+    return policy
+
+def segment_speed(segments):
+    """Apply different speeds to different parts of the recording.
+
+    segments is a list of (start_index, end_index, factor) tuples. The end index
+    is exclusive, and None means "until the end". Gaps outside any segment are kept.
+    """
+    for _, _, factor in segments:
+        if factor <= 0:
+            raise ValueError("Speed factor must be positive.")
+    def policy(actions, gaps):
+        gaps = list(gaps)
+        for start, end, factor in segments:
+            end = len(gaps) if end is None else min(end, len(gaps))
+            for i in range(max(start, 0), end):
+                gaps[i] = gaps[i] / factor
+        return gaps
+    return policy
+
+def build_schedule(actions, policies=None):
+    """Return the gap to wait before each action after applying the policies."""
+    gaps = compute_gaps(actions)
+    for policy in policies or []:
+        gaps = policy(actions, gaps)
+    return gaps
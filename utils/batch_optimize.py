@@ -0,0 +1,243 @@
+# utils/batch_optimize.py
+#
+# Convert, clean up and validate every recording in a directory in parallel.
+# Run from the project root, e.g.:
+#     python -m utils.batch_optimize --simplify 2 --max-idle 3
+import os
+import sys
+import json
+import math
+import stat
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import timing
+import keystroke_batch
+from recording_files import find_recordings, validate_actions
+
+def load_config(path="config.json"):
+    """Load the application configuration, or an empty dict if it is missing."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _distance_to_segment(point, start, end):
+    """Distance from a point to the line segment between start and end."""
+    (px, py), (sx, sy), (ex, ey) = point, start, end
+    length_squared = (ex - sx) ** 2 + (ey - sy) ** 2
+    if length_squared == 0:
+        return math.hypot(px - sx, py - sy)
+    t = max(0.0, min(1.0, ((px - sx) * (ex - sx) + (py - sy) * (ey - sy)) / length_squared))
+    return math.hypot(px - (sx + t * (ex - sx)), py - (sy + t * (ey - sy)))
+
+def _simplify_run(run, epsilon, max_gap):
+    """Keep the moves needed to follow a path within epsilon pixels (Ramer-Douglas-Peucker).
+
+    Replay jumps straight to each kept move, so moves are also kept wherever
+    dropping them would leave more than max_gap seconds between kept moves.
+    Otherwise a slow drag would turn into a long pause followed by a jump.
+    """
+    keep = [False] * len(run)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(run) - 1)]
+    while stack:
+        first, last = stack.pop()
+        start = (run[first]["x"], run[first]["y"])
+        end = (run[last]["x"], run[last]["y"])
+        farthest, farthest_distance = None, epsilon
+        for i in range(first + 1, last):
+            distance = _distance_to_segment((run[i]["x"], run[i]["y"]), start, end)
+            if distance > farthest_distance:
+                farthest, farthest_distance = i, distance
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    previous = 0
+    for i in range(1, len(run)):
+        if keep[i]:
+            previous = i
+        elif run[i + 1]["timestamp"] - run[previous]["timestamp"] > max_gap:
+            keep[i] = True
+            previous = i
+    return [action for action, kept in zip(run, keep) if kept]
+
+def simplify_path(actions, epsilon, max_gap=0.25):
+    """Drop mouse moves that do not change the path by more than epsilon pixels.
+
+    Moves that are kept keep their timestamps, so the time of a dropped move
+    is added to the wait before the next one, but never more than max_gap seconds.
+    """
+    kept = set()
+    run = []
+    for action in actions + [None]:
+        if action is not None and action["type"] == "move":
+            run.append(action)
+            continue
+        if run:
+            kept.update(id(move) for move in (_simplify_run(run, epsilon, max_gap) if len(run) > 2 else run))
+            run = []
+        if action is not None:
+            kept.add(id(action))
+    if len(kept) == len(actions):
+        return actions
+
+    # Only the action after a dropped move waits longer, by the delays it no longer follows
+    result = []
+    dropped_delay = 0.0
+    for action in actions:
+        if id(action) not in kept:
+            dropped_delay += action.get("delay", 0)
+            continue
+        if dropped_delay and "delay" in action:
+            action = {**action, "delay": action["delay"] + dropped_delay}
+        dropped_delay = 0.0
+        result.append(action)
+    return result
+
+def clamp_idle(actions, max_idle):
+    """Shorten every gap longer than max_idle seconds to max_idle.
+
+    Later actions move earlier by the time cut so far. Only the actions after
+    a shortened gap get a new delay.
+    """
+    gaps = timing.compute_gaps(actions)
+    capped = timing.build_schedule(actions, [timing.cap_idle(max_idle)])
+    if capped == gaps:
+        return actions
+    result = []
+    shift = 0.0
+    for action, gap, new_gap in zip(actions, gaps, capped):
+        cut = gap - new_gap
+        shift += cut
+        if shift:
+            action = dict(action)
+            action["timestamp"] -= shift
+            if "end_timestamp" in action:
+                action["end_timestamp"] -= shift
+            if cut and "delay" in action:
+                action["delay"] = new_gap
+        result.append(action)
+    return result
+
+def serialize(actions, indent=None, compact=False):
+    """Serialize actions. By default this matches the output of recording.save_actions."""
+    if compact:
+        return json.dumps(actions, separators=(",", ":"))
+    return json.dumps(actions, indent=indent)
+
+def write_atomic(path, data):
+    """Write a file through a temporary file so it is never left half written."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+        # mkstemp creates the file as 0600, so keep the recording's own permissions
+        os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def process_file(path, options):
+    """Convert, clean up and validate one recording. Returns a result dict for the report."""
+    result = {"path": path, "status": "unchanged", "before": 0, "after": 0, "message": ""}
+    try:
+        with open(path, "r") as f:
+            original = f.read()
+        try:
+            actions = json.loads(original)
+        except ValueError as e:
+            result.update(status="invalid", message=f"Not valid JSON: {e}")
+            return result
+        errors = validate_actions(actions)
+        if errors:
+            result.update(status="invalid", message="; ".join(errors[:3]))
+            return result
+        result["before"] = len(actions)
+        if options.get("simplify"):
+            actions = simplify_path(actions, options["simplify"], options.get("max_move_gap", 0.25))
+        if options.get("max_idle"):
+            actions = clamp_idle(actions, options["max_idle"])
+        if options.get("coalesce_typing"):
+            actions = keystroke_batch.coalesce_keystrokes(actions, options.get("typing_interval", 0.0))
+        result["after"] = len(actions)
+        data = serialize(actions, options.get("indent"), options.get("compact"))
+        if options.get("indent") is not None or options.get("compact"):
+            # Reformatting was asked for, so the exact text matters
+            if data == original:
+                return result
+        elif actions == json.loads(original):
+            return result
+        result["status"] = "changed"
+        if not options.get("dry_run"):
+            write_atomic(path, data)
+    except Exception as e:
+        result.update(status="error", message=str(e))
+    return result
+
+def process_directory(directory, options, jobs=None):
+    """Process every recording in a directory with a pool of worker processes."""
+    paths = find_recordings(directory)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, len(paths) // ((jobs or os.cpu_count() or 1) * 8))
+        return list(executor.map(process_file, paths, [options] * len(paths), chunksize=chunksize))
+
+def print_report(results, verbose=False):
+    """Print a summary of the batch run."""
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        if verbose or result["status"] in ("invalid", "error"):
+            print(f"{result['status']:>9}  {result['path']}  {result['message']}")
+    before = sum(result["before"] for result in results)
+    after = sum(result["after"] for result in results)
+    print(f"Processed {len(results)} recordings: "
+          f"{counts.get('changed', 0)} changed, {counts.get('unchanged', 0)} unchanged, "
+          f"{counts.get('invalid', 0)} invalid, {counts.get('error', 0)} errors.")
+    print(f"Actions: {before} before, {after} after.")
+
+def main(argv=None):
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Convert, clean up and validate MousePad recordings.")
+    parser.add_argument("directory", nargs="?", default=config.get("save_path", "actions/"),
+                        help="Directory with recordings (default: save_path from config.json)")
+    parser.add_argument("--simplify", type=float, default=0,
+                        help="Drop mouse moves that change the path by less than this many pixels")
+    parser.add_argument("--max-move-gap", type=float, default=0.25,
+                        help="Keep moves so that simplified paths never wait longer than this many seconds")
+    parser.add_argument("--max-idle", type=float, default=0,
+                        help="Shorten pauses longer than this many seconds")
+    parser.add_argument("--coalesce-typing", action="store_true",
+                        help="Store runs of plain typing as batched text")
+    parser.add_argument("--typing-interval", type=float, default=0.0,
+                        help="Seconds between characters of batched text")
+    parser.add_argument("--indent", type=int, default=None,
+                        help="Rewrite every recording as JSON indented by this many spaces")
+    parser.add_argument("--compact", action="store_true",
+                        help="Rewrite every recording as JSON without any spaces")
+    parser.add_argument("--jobs", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing files")
+    parser.add_argument("--verbose", action="store_true", help="List every file in the report")
+    args = parser.parse_args(argv)
+
+    options = {
+        "simplify": args.simplify,
+        "max_move_gap": args.max_move_gap,
+        "max_idle": args.max_idle,
+        "coalesce_typing": args.coalesce_typing,
+        "typing_interval": args.typing_interval,
+        "indent": args.indent,
+        "compact": args.compact,
+        "dry_run": args.dry_run
+    }
+    results = process_directory(args.directory, options, args.jobs)
+    print_report(results, args.verbose)
+    return 1 if any(result["status"] == "error" for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+# verification.py
+#
+# Replay a recording while capturing the injected input with a separate listener
+# session, then compare what happened with what was recorded. Run from the project root:
+#     python -m verification actions/actions.json --speed 2 --virtual-display
+#
+# recording (and with it pyautogui) is imported inside the functions, because
+# pyautogui connects to the display on import and --virtual-display has to set
+# DISPLAY before that happens.
+import os
+import sys
+import json
+import time
+import bisect
+import argparse
+import subprocess
+import threading
+import numpy as np
+from difflib import SequenceMatcher
+
+import timing
+import keystroke_batch
+from input_helpers import get_key_name
+
+# Action types that move the cursor without a discrete event
+MOVE_TYPES = ("start", "move", "end")
+
+class CaptureSession:
+    """Listen to mouse and keyboard input independently of the recorder in recording.py."""
+
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+        self.mouse_listener = None
+        self.keyboard_listener = None
+
+    def add(self, action_type, **kwargs):
+        with self.lock:
+            self.events.append({"type": action_type, "timestamp": time.time(), **kwargs})
+
+    def start(self):
+        """Start the listeners and wait until they are running."""
+        from pynput import mouse, keyboard
+        self.mouse_listener = mouse.Listener(
+            on_move=lambda x, y: self.add("move", x=x, y=y),
+            on_click=lambda x, y, button, pressed: self.add(
+                "button_press" if pressed else "button_release", x=x, y=y, button=button.name),
+            on_scroll=lambda x, y, dx, dy: self.add("scroll", x=x, y=y, dx=dx, dy=dy))
+        self.keyboard_listener = keyboard.Listener(
+            on_press=lambda key: self.add("key_press", key=get_key_name(key)),
+            on_release=lambda key: self.add("key_release", key=get_key_name(key)))
+        self.mouse_listener.start()
+        self.keyboard_listener.start()
+        self.mouse_listener.wait()
+        self.keyboard_listener.wait()
+
+    def stop(self):
+        """Stop the listeners and return the captured events."""
+        for listener in (self.mouse_listener, self.keyboard_listener):
+            if listener is not None:
+                listener.stop()
+        self.mouse_listener = None
+        self.keyboard_listener = None
+        with self.lock:
+            return list(self.events)
+
+def event_token(action):
+    """Describe a discrete event so recorded and captured streams can be aligned."""
+    if action["type"] in ("button_press", "button_release"):
+        return f"{action['type']}:{action['button']}"
+    if action["type"] in ("key_press", "key_release"):
+        return f"{action['type']}:{action['key']}"
+    if action["type"] == "scroll":
+        return f"scroll:{'up' if action['dy'] > 0 else 'down'}"
+    return None
+
+def expected_offsets(actions, timing_policies=None):
+    """Return when each action should start, in seconds from the start of the replay.
+
+    This follows replay_actions, which turns off pyautogui's pause after each call:
+    wait for the scheduled gap, then run the action. Batched text takes its
+    per-character interval for every character it types. Sync points skip their
+    gap and wait for the screen instead, which takes as long as it takes, so the
+    offsets after one assume it matched at once.
+    """
+    offsets = []
+    elapsed = 0.0
+    for action, gap in zip(actions, timing.build_schedule(actions, timing_policies)):
+        if action["type"] != "sync":
+            elapsed += gap
+        offsets.append(elapsed)
+        if action["type"] == "type_text":
+            elapsed += len(action["text"]) * action["interval"]
+    return offsets
+
+def expected_events(actions, offsets):
+    """List the discrete events a replay should produce as (action index, token, offset).
+
+    A type_text action produces a key press and release for each character.
+    """
+    events = []
+    for i, action in enumerate(actions):
+        if action["type"] == "type_text":
+            for k, char in enumerate(action["text"]):
+                key = "space" if char == " " else char
+                offset = offsets[i] + k * action["interval"]
+                events.append((i, f"key_press:{key}", offset))
+                events.append((i, f"key_release:{key}", offset))
+        elif event_token(action):
+            events.append((i, event_token(action), offsets[i]))
+    return events
+
+def distribution(values):
+    """Summarize a list of errors, or return None if there are none."""
+    if not values:
+        return None
+    values = np.asarray(values, dtype=np.float64)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"count": len(values), "mean": float(values.mean()), "p50": float(p50),
+            "p90": float(p90), "p99": float(p99), "max": float(values.max())}
+
+def compare(source, captured, timing_policies=None):
+    """Align captured events with the replayed actions and measure the differences.
+
+    source must be the action list replay_actions actually ran, so after keystroke
+    coalescing when that was enabled. Discrete events (clicks, keys, scrolls) are
+    matched in order. Timing errors are measured against the schedule the timing
+    policies produce. Each sync point waits for the screen for an unknown time, so
+    the events between two sync points are timed relative to the first matched event
+    among them, and the extra time spent across each sync point is reported as its
+    sync wait. For cursor moves, the error is the distance between the recorded
+    target and where the cursor was just before the next action was due, corrected
+    for the replay's drift at the last matched event.
+    """
+    offsets = expected_offsets(source, timing_policies)
+    source_events = expected_events(source, offsets)
+    captured_events = [(j, event_token(a)) for j, a in enumerate(captured) if event_token(a)]
+    matcher = SequenceMatcher(None, [t for _, t, _ in source_events], [t for _, t in captured_events], autojunk=False)
+    pairs = []
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            pairs.append((source_events[block.a + k], captured_events[block.b + k][0]))
+
+    # Sync points split the replay into segments, numbered by the sync points before them
+    sync_indices = [i for i, action in enumerate(source) if action["type"] == "sync"]
+    def segment(i):
+        return bisect.bisect_left(sync_indices, i)
+
+    # (expected offset, captured timestamp) of the first and last matched event in each segment
+    first_matched = {}
+    last_matched = {}
+    for (i, _, offset), j in pairs:
+        first_matched.setdefault(segment(i), (offset, captured[j]["timestamp"]))
+        last_matched[segment(i)] = (offset, captured[j]["timestamp"])
+    if not pairs and captured:
+        # Without a matched event, assume the replay started with the first captured event
+        first_matched[0] = (0.0, captured[0]["timestamp"])
+
+    position_errors = []
+    timing_errors = []
+    for (i, _, offset), j in pairs:
+        expected_base, actual_base = first_matched[segment(i)]
+        expected = offset - expected_base
+        actual = captured[j]["timestamp"] - actual_base
+        timing_errors.append(actual - expected)
+        if "x" in source[i] and "x" in captured[j]:
+            position_errors.append(float(np.hypot(captured[j]["x"] - source[i]["x"], captured[j]["y"] - source[i]["y"])))
+
+    sync_waits = []
+    for number in range(len(sync_indices)):
+        if number in last_matched and number + 1 in first_matched:
+            (before_offset, before_time), (after_offset, after_time) = last_matched[number], first_matched[number + 1]
+            sync_waits.append((after_time - before_time) - (after_offset - before_offset))
+
+    move_times = [a["timestamp"] for a in captured if a["type"] == "move"]
+    move_positions = [(a["x"], a["y"]) for a in captured if a["type"] == "move"]
+    matched_sources = [i for (i, _, _), _ in pairs]
+    move_errors = []
+    for i, action in enumerate(source):
+        if action["type"] not in MOVE_TYPES or not move_times:
+            continue
+        if i + 1 < len(source):
+            # Time the next action from the last matched event before it, so drift does not pile up,
+            # unless a sync point lies in between; then use the first matched event after the sync point
+            k = bisect.bisect_right(matched_sources, i + 1) - 1
+            if k >= 0 and segment(matched_sources[k]) == segment(i + 1):
+                (_, _, offset), j = pairs[k]
+                anchor = (offset, captured[j]["timestamp"])
+            elif segment(i + 1) in first_matched:
+                anchor = first_matched[segment(i + 1)]
+            else:
+                continue
+            due = anchor[1] + offsets[i + 1] - anchor[0]
+        else:
+            due = float("inf")
+        index = bisect.bisect_right(move_times, due) - 1
+        if index >= 0:
+            x, y = move_positions[index]
+            move_errors.append(float(np.hypot(x - action["x"], y - action["y"])))
+
+    return {
+        "source_events": len(source_events),
+        "captured_events": len(captured_events),
+        "matched": len(pairs),
+        "dropped": len(source_events) - len(pairs),
+        "extra": len(captured_events) - len(pairs),
+        "position_error": distribution(position_errors),
+        "move_error": distribution(move_errors),
+        "timing_error": distribution(timing_errors),
+        "timing_error_abs": distribution([abs(error) for error in timing_errors]),
+        "sync_wait": distribution(sync_waits)
+    }
+
+def verify_replay(actions, speed_factor=1.0, timing_policies=None, coalesce_typing=False,
+                  typing_interval=0.0, update_log=None):
+    """Replay actions while capturing the injected input, and return a comparison report."""
+    import recording
+    if timing_policies is None:
+        timing_policies = [timing.scale_speed(speed_factor)]
+    # Coalesce here and replay the result, so the comparison uses the exact actions and schedule that ran
+    replayed = keystroke_batch.coalesce_keystrokes(actions, typing_interval) if coalesce_typing else actions
+    previous_actions = recording.get_recorded_actions()
+    recording.set_recorded_actions(replayed)
+    session = CaptureSession()
+    session.start()
+    try:
+        recording.replay_actions(1, speed_factor, update_log, timing_policies)
+    finally:
+        captured = session.stop()
+        recording.set_recorded_actions(previous_actions)
+    return compare(replayed, captured, timing_policies)
+
+def format_report(report):
+    """Format a comparison report as readable text."""
+    lines = [
+        f"Events: {report['source_events']} recorded, {report['captured_events']} captured, "
+        f"{report['matched']} matched",
+        f"Dropped: {report['dropped']}   Extra: {report['extra']}"
+    ]
+    for name, label, unit in (("position_error", "Click/scroll position error", "px"),
+                              ("move_error", "Cursor position error", "px"),
+                              ("timing_error", "Timing error", "s"),
+                              ("timing_error_abs", "Absolute timing error", "s"),
+                              ("sync_wait", "Sync wait", "s")):
+        stats = report[name]
+        if stats is None:
+            lines.append(f"{label}: no data")
+        else:
+            lines.append(f"{label} ({unit}): mean {stats['mean']:.3f}, p50 {stats['p50']:.3f}, "
+                         f"p90 {stats['p90']:.3f}, p99 {stats['p99']:.3f}, max {stats['max']:.3f}")
+    return "\n".join(lines)
+
+def find_free_display():
+    """Find an X display number that is not in use."""
+    for number in range(99, 200):
+        if not os.path.exists(f"/tmp/.X11-unix/X{number}") and not os.path.exists(f"/tmp/.X{number}-lock"):
+            return number
+    raise RuntimeError("No free X display number found.")
+
+def run_on_virtual_display(argv, size="1920x1080"):
+    """Run the verification again inside a fresh Xvfb display so it does not touch the real desktop."""
+    number = find_free_display()
+    xvfb = subprocess.Popen(["Xvfb", f":{number}", "-screen", "0", f"{size}x24", "-nolisten", "tcp"])
+    try:
+        deadline = time.time() + 10
+        while not os.path.exists(f"/tmp/.X11-unix/X{number}"):
+            if xvfb.poll() is not None or time.time() > deadline:
+                raise RuntimeError("Xvfb did not start.")
+            time.sleep(0.1)
+        env = dict(os.environ, DISPLAY=f":{number}")
+        return subprocess.run([sys.executable, "-m", "verification", *argv], env=env).returncode
+    finally:
+        xvfb.terminate()
+        xvfb.wait()
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(description="Check that replaying a recording reproduces its input.")
+    parser.add_argument("filename", help="Recording to replay")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor")
+    parser.add_argument("--max-idle", type=float, default=0, help="Shorten pauses longer than this many seconds")
+    parser.add_argument("--min-gap", type=float, default=0, help="Minimum seconds between actions")
+    parser.add_argument("--coalesce-typing", action="store_true", help="Replay plain typing as batched text")
+    parser.add_argument("--typing-interval", type=float, default=0.0, help="Seconds between batched characters")
+    parser.add_argument("--virtual-display", action="store_true", help="Run inside a new Xvfb display")
+    parser.add_argument("--screen-size", default="1920x1080", help="Size of the virtual display")
+    parser.add_argument("--max-position-error", type=float, default=None,
+                        help="Fail if the p90 click or cursor position error exceeds this many pixels")
+    parser.add_argument("--max-timing-error", type=float, default=None,
+                        help="Fail if the p90 absolute timing error exceeds this many seconds")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.virtual_display:
+        inner = [arg for arg in argv if arg != "--virtual-display"]
+        return run_on_virtual_display(inner, args.screen_size)
+
+    with open(args.filename, "r") as f:
+        actions = json.load(f)
+    policies = []
+    if args.max_idle:
+        policies.append(timing.cap_idle(args.max_idle))
+    policies.append(timing.scale_speed(args.speed))
+    if args.min_gap:
+        policies.append(timing.min_gap(args.min_gap))
+    report = verify_replay(actions, args.speed, policies, args.coalesce_typing, args.typing_interval)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+    failed = report["dropped"] > 0 or report["extra"] > 0
+    if args.max_position_error is not None:
+        for name in ("position_error", "move_error"):
+            if report[name] and report[name]["p90"] > args.max_position_error:
+                failed = True
+    if args.max_timing_error is not None and report["timing_error_abs"]:
+        if report["timing_error_abs"]["p90"] > args.max_timing_error:
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())